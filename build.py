@@ -4,6 +4,7 @@
 import os
 import sys
 import shutil
+import argparse
 import subprocess
 from datetime import datetime
 
@@ -25,8 +26,11 @@ def install_pyinstaller():
         print(f"安装PyInstaller失败: {e}")
         return False
 
-def build_exe():
-    """构建可执行程序"""
+def build_exe(incremental: bool = False):
+    """构建可执行程序
+    
+    incremental为True时保留build目录和PyInstaller缓存，重复构建时可跳过已完成的依赖分析
+    """
     # 检查源文件是否存在
     if not os.path.exists("jtdx_monitor.py"):
         print("错误: 未找到源文件 jtdx_monitor.py")
@@ -35,7 +39,8 @@ def build_exe():
     # 创建构建目录
     build_dir = "build"
     dist_dir = "dist"
-    for dir_path in [build_dir, dist_dir]:
+    # 增量构建时保留build目录中的分析结果
+    for dir_path in ([dist_dir] if incremental else [build_dir, dist_dir]):
         if os.path.exists(dir_path):
             shutil.rmtree(dir_path)
         os.makedirs(dir_path)
@@ -44,20 +49,17 @@ def build_exe():
     cmd = [
         "pyinstaller",
         "--noconfirm",
-        "--clean",
         "--onefile",  # 生成单个可执行文件
         "--name", "jtdx_monitor",
         "--icon", "NONE",  # 不使用图标
         "--add-data", "README.md;.",  # 添加README文件
         "--add-data", "notifiers.py;.",  # 添加通知模块
-        "--hidden-import", "queue",
-        "--hidden-import", "threading",
         "--hidden-import", "argparse",
-        "--hidden-import", "requests",
-        "--hidden-import", "urllib.parse",
         "--hidden-import", "abc",
         "jtdx_monitor.py"
     ]
+    if not incremental:
+        cmd.insert(1, "--clean")
 
     print("开始构建可执行程序...")
     try:
@@ -97,6 +99,12 @@ def build_exe():
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='JTDX监控程序构建工具')
+    parser.add_argument('--incremental',
+                      action='store_true',
+                      help='增量构建，保留上次的构建缓存')
+    args = parser.parse_args()
+    
     print("JTDX监控程序构建工具")
     print("=" * 40)
     
@@ -108,7 +116,7 @@ def main():
             return
     
     # 构建可执行程序
-    if build_exe():
+    if build_exe(args.incremental):
         print("\n构建过程完成")
     else:
         print("\n构建过程失败")
@@ -2,22 +2,40 @@
 # -*- coding: utf-8 -*-
 
 import os
-import glob
 import re
-import json
 import time
-import queue
-import threading
 import argparse
-import requests
-import urllib.parse
-from datetime import datetime
+import threading
 from typing import Tuple, Optional, Set
 from notifiers import BaseNotifier, ServerChanNotifier
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import fnmatch
-from message_queue import MessageQueue, Message
+
+def _open_log(path: str):
+    """以二进制方式打开日志文件
+
+    Windows下默认打开方式会阻止其他程序删除或重命名该文件，这里允许共享删除
+    """
+    if os.name == 'nt':
+        try:
+            import msvcrt
+            import pywintypes
+            import win32file
+        except ImportError:
+            pass
+        else:
+            try:
+                handle = win32file.CreateFile(
+                    path, win32file.GENERIC_READ,
+                    win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE | win32file.FILE_SHARE_DELETE,
+                    None, win32file.OPEN_EXISTING, 0, None)
+            except pywintypes.error as e:
+                # 统一转换为OSError，调用方只需处理一种异常
+                raise OSError(e.winerror, e.strerror, path) from e
+            fd = msvcrt.open_osfhandle(handle.Detach(), os.O_RDONLY)
+            return open(fd, 'rb', buffering=1 << 16)
+    return open(path, 'rb', buffering=1 << 16)
 
 class JTDXLogMonitor:
     def __init__(self, log_dir: str, monitor_name: str, notifier: Optional[BaseNotifier] = None,
@@ -26,8 +44,18 @@ class JTDXLogMonitor:
         self.monitor_name = monitor_name
         self.last_position = 0
         self.current_file = None
+        self._fh = None  # 当前日志文件句柄，在多次修改事件之间保持打开
+        self._buf = bytearray()  # 上次读取末尾未写完的行
         self.notifier = notifier
         self.callsign_prefixes = callsign_prefixes or set()
+        # 将所有忽略规则合并为一个正则，避免逐条调用fnmatch
+        # fnmatch在大小写不敏感的系统（Windows）上会忽略大小写，这里保持一致
+        if self.callsign_prefixes:
+            flags = re.IGNORECASE if os.path.normcase('A') != 'A' else 0
+            self._ignore_re = re.compile(
+                '|'.join(f'(?:{fnmatch.translate(p)})' for p in self.callsign_prefixes), flags)
+        else:
+            self._ignore_re = None
     
     def should_process_callsign(self, callsign: Optional[str]) -> bool:
         """检查呼号是否应该被处理
@@ -35,25 +63,26 @@ class JTDXLogMonitor:
         如果没有设置忽略规则，处理所有呼号
         如果设置了忽略规则，不处理匹配规则的呼号
         """
-        if not callsign or not self.callsign_prefixes:
+        if not callsign or self._ignore_re is None:
             return bool(callsign)
         
         # 如果呼号匹配任何一个需要忽略的通配符规则，则不处理
-        return not any(fnmatch.fnmatch(callsign, pattern) for pattern in self.callsign_prefixes)
+        return not self._ignore_re.match(callsign)
     
     def find_latest_log(self) -> Optional[str]:
         """查找最新的JTDX日志文件"""
-        pattern = os.path.join(self.log_dir, "[0-9]" * 6 + "_ALL.TXT")
-        log_files = glob.glob(pattern)
-        if not log_files:
-            return None
-        return max(log_files)
+        # 日志文件名形如 YYYYMM_ALL.TXT，文件名最大的即为最新
+        latest = None
+        with os.scandir(self.log_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if len(name) == 14 and name.endswith('_ALL.TXT') and name[:6].isdigit():
+                    if latest is None or name > latest:
+                        latest = name
+        return os.path.join(self.log_dir, latest) if latest else None
     
     def parse_ft8_message(self, message: str) -> Tuple[Optional[str], Optional[str]]:
-        """解析FT8消息，提取主叫和被叫台站"""
-        # 移除解码状态标记
-        message = re.sub(r'[*^]$', '', message.strip())
-        
+        """解析FT8消息（已去除解码状态标记），提取主叫和被叫台站"""
         # 忽略包含<...>的消息
         if '<...>' in message:
             return None, None
@@ -79,14 +108,34 @@ class JTDXLogMonitor:
     
     def process_line(self, line: str) -> Optional[Tuple[str, str, str]]:
         """处理单行日志"""
-        # 匹配解码行
-        decode_pattern = r'^(\d{8}_\d{6})\s+(-?\d+)\s+(-?\d+(?:\.\d)?)\s+([0-9]|[1-9]\d{1,2}|1\d{3}|2\d{3}|3[0-4]\d{2}|3500)\s+~\s+(.+)$'
-        match = re.match(decode_pattern, line.strip())
-        
-        if not match:
+        # 解码行必定以"YYYYMMDD_"开头，先用字符判断快速排除其他行
+        date = line[:8]
+        if len(line) < 16 or line[8] != '_' or not (date.isascii() and date.isdigit()):
             return None
             
-        timestamp, snr, dt, freq, message_and_status = match.groups()
+        # 解码行按空白分为固定列：时间戳 信噪比 时间偏移 频率 ~ 消息[状态标记]
+        parts = line.split(None, 5)
+        if len(parts) < 6 or parts[4] != '~':
+            return None
+            
+        timestamp, snr, dt, freq, _, message_and_status = parts
+        # 各列只接受ASCII数字：str.isdigit()对"²"等字符也为真，int()却无法转换
+        clock = timestamp[9:]
+        if len(timestamp) != 15 or not (clock.isascii() and clock.isdigit()):
+            return None
+        # 频率为0~3500的整数，多位数时不能以0开头
+        if (not (freq.isascii() and freq.isdigit()) or (len(freq) > 1 and freq[0] == '0')
+                or int(freq) > 3500):
+            return None
+        # 信噪比为整数，时间偏移为整数或一位小数，不接受nan、inf、1e3等写法
+        if not (snr.isascii() and snr.removeprefix('-').isdigit()):
+            return None
+        whole, dot, frac = dt.removeprefix('-').partition('.')
+        if not (dt.isascii() and whole.isdigit()
+                and (not dot or (len(frac) == 1 and frac.isdigit()))):
+            return None
+        # 整行只在这里去一次行尾空白和换行符
+        message_and_status = message_and_status.rstrip()
         # 分离正文和状态标记
         if message_and_status and message_and_status[-1] in ('*', '^'):
             message = message_and_status[:-1]
@@ -105,68 +154,171 @@ class JTDXLogMonitor:
         # 如果配置了消息队列，添加消息
         if self.notifier and caller:
             # 只添加主叫方呼号
-            self.notifier.add_message(Message(caller))
+            self.notifier.add_message(caller)
         
         if caller or called:
             return timestamp, caller, called
         return None
     
-    def monitor(self):
-        """监控日志文件的新内容"""
+    def scan_new_file(self, from_start: bool = False):
+        """查找最新的日志文件，发现新文件或文件被重建时切换过去
+        
+        from_start为True时从新文件开头读取（文件由创建或移动事件发现），
+        否则从文件末尾开始，只处理之后新增的内容（程序启动时）
+        """
         current_file = self.find_latest_log()
         if not current_file:
             print("未找到日志文件")
+            # 日志文件已被删除时释放句柄，同名文件重新出现后从头读取
+            self.close()
             return
-            
-        if current_file != self.current_file:
-            if self.current_file:
-                print(f"\n切换到新日志文件: {os.path.basename(current_file)}")
-            else:
-                print(f"开始监控日志文件: {os.path.basename(current_file)}")
-            self.current_file = current_file
-            self.last_position = os.path.getsize(current_file)
+        recreated = False
+        if current_file == self.current_file:
+            if self._fh:
+                try:
+                    same = os.path.samestat(os.stat(current_file), os.fstat(self._fh.fileno()))
+                except OSError:
+                    same = False
+                if same:
+                    return
+            # 同名文件被删除后重新创建，新文件从头读取
+            recreated = from_start = True
+        
+        # 先打开新文件，成功后再切换，失败时保持原有状态等待下次重试
+        try:
+            fh = _open_log(current_file)
+            if not from_start:
+                fh.seek(0, os.SEEK_END)
+        except OSError as e:
+            print(f"打开日志文件失败: {e}")
             return
-            
+        
+        if recreated:
+            print(f"日志文件已重建，重新开始监控: {os.path.basename(current_file)}")
+        elif self.current_file:
+            print(f"\n切换到新日志文件: {os.path.basename(current_file)}")
+        else:
+            print(f"开始监控日志文件: {os.path.basename(current_file)}")
+        self.close()
+        self.current_file = current_file
+        self._fh = fh
+        self.last_position = fh.tell()
+        self._buf.clear()
+    
+    def _consume_appended(self):
+        """读取日志文件新增的内容"""
         try:
-            with open(current_file, 'r', encoding='utf-8') as f:
-                file_size = os.path.getsize(current_file)
-                if file_size < self.last_position:
-                    # 文件被截断，重置位置
-                    print(f"文件被截断，重新开始监控: {os.path.basename(current_file)}")
-                    self.last_position = 0
-                if file_size > self.last_position:
-                    f.seek(self.last_position)
-                    while True:
-                        try:
-                            line = f.readline()
-                            if not line:
-                                break
-                            result = self.process_line(line)
-                            if result:
-                                timestamp, caller, called = result
-                                dt = datetime.strptime(timestamp, '%Y%m%d_%H%M%S')
-                                time_str = dt.strftime('%H:%M:%S')
-                                if called:
-                                    print(f"{time_str} - 定向呼叫: {caller} -> {called}")
-                                else:
-                                    print(f"{time_str} - CQ呼叫: {caller}")
-                        except UnicodeDecodeError as e:
-                            print(f"警告：跳过一行无法解码的日志（utf-8错误）：{e}")
-                            continue
-                    self.last_position = file_size
+            # 文件句柄始终停在上次读到的位置，直接读到文件末尾即可
+            data = self._fh.read()
+            if not data and os.fstat(self._fh.fileno()).st_size < self.last_position:
+                # 文件被截断，重置位置
+                print(f"文件被截断，重新开始监控: {os.path.basename(self.current_file)}")
+                self.last_position = 0
+                self._buf.clear()
+                self._fh.seek(0)
+                data = self._fh.read()
+            self.last_position += len(data)
+            if not data:
+                return
+                
+            # 最后一段可能是尚未写完的行，留到下次读取时拼接
+            self._buf += data
+            *lines, self._buf = self._buf.split(b'\n')
+            # 输出先收集起来一次性打印，追读大量积压日志时避免逐行写控制台
+            output = []
+            for raw in lines:
+                # 解码行以"YYYYMMDD_"开头，其他行不必解码成字符串
+                if len(raw) < 16 or raw[8:9] != b'_':
+                    continue
+                result = self.process_line(raw.decode('utf-8', 'replace'))
+                if result:
+                    timestamp, caller, called = result
+                    # 时间戳格式已在process_line中校验，直接切片取时分秒
+                    time_str = f"{timestamp[9:11]}:{timestamp[11:13]}:{timestamp[13:15]}"
+                    if called:
+                        output.append(f"{time_str} - 定向呼叫: {caller} -> {called}")
+                    else:
+                        output.append(f"{time_str} - CQ呼叫: {caller}")
+            if output:
+                print('\n'.join(output))
         except Exception as e:
             print(f"处理日志文件时出错: {e}")
+    
+    def monitor(self):
+        """监控日志文件的新内容"""
+        if self._fh:
+            self._consume_appended()
+    
+    def is_open(self) -> bool:
+        """当前日志文件是否已打开"""
+        return self._fh is not None
+    
+    def close(self):
+        """关闭当前打开的日志文件"""
+        if self._fh:
+            self._fh.close()
+            self._fh = None
 
 class LogFileEventHandler(FileSystemEventHandler):
+    # JTDX写一次日志往往触发多个修改事件，合并该时间窗口内的事件只处理一次
+    DEBOUNCE_SECONDS = 0.05
+    
     def __init__(self, monitor: JTDXLogMonitor):
         self.monitor = monitor
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # 保证日志文件只在一个线程中读取
+        self._timer = None
+        self._rescan = False
+        self._from_start = False  # 切换到的新文件是否从头读取
+
+    def _schedule(self, rescan: bool = False, from_start: bool = False):
+        """安排一次延迟处理，已安排时直接合并"""
+        with self._lock:
+            self._rescan = self._rescan or rescan
+            self._from_start = self._from_start or from_start
+            if self._timer is None:
+                self._timer = threading.Timer(self.DEBOUNCE_SECONDS, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        """处理合并后的事件"""
+        with self._lock:
+            self._timer = None
+            rescan, self._rescan = self._rescan, False
+            from_start, self._from_start = self._from_start, False
+        with self._run_lock:
+            if rescan:
+                self.monitor.scan_new_file(from_start)
+            self.monitor.monitor()  # 只处理新增内容
+
+    def on_created(self, event):
+        # 新日志文件出现时才重新查找最新日志，创建后已写入的内容也要处理
+        if not event.is_directory and event.src_path.endswith('_ALL.TXT'):
+            self._schedule(rescan=True, from_start=True)
+
+    def on_deleted(self, event):
+        # 当前日志文件被删除时重新查找，释放旧文件句柄
+        if not event.is_directory and event.src_path.endswith('_ALL.TXT'):
+            current_file = self.monitor.current_file
+            if current_file and os.path.abspath(event.src_path) == os.path.abspath(current_file):
+                self._schedule(rescan=True)
+
+    def on_moved(self, event):
+        if not event.is_directory and event.dest_path.endswith('_ALL.TXT'):
+            self._schedule(rescan=True, from_start=True)
 
     def on_modified(self, event):
         # 只处理文件修改事件
         if not event.is_directory and event.src_path.endswith('_ALL.TXT'):
             # 只处理最新日志文件
-            if os.path.abspath(event.src_path) == os.path.abspath(self.monitor.current_file):
-                self.monitor.monitor()  # 只处理新增内容
+            current_file = self.monitor.current_file
+            if current_file and os.path.abspath(event.src_path) == os.path.abspath(current_file):
+                if self.monitor.is_open():
+                    self._schedule()
+                    return
+            # 其他日志文件或未能打开的当前文件有写入，可能是之前打开失败，重新查找
+            self._schedule(rescan=True, from_start=True)
 
 def main():
     # 解析命令行参数
@@ -230,6 +382,9 @@ def main():
     if callsign_prefixes:
         print(f"忽略呼号规则: {', '.join(sorted(callsign_prefixes))}")
     
+    # 先定位当前最新的日志文件，之后由watchdog事件驱动
+    monitor.scan_new_file()
+    
     # 启动watchdog监控
     event_handler = LogFileEventHandler(monitor)
     observer = Observer()
@@ -244,9 +399,11 @@ def main():
         observer.stop()
         if monitor.notifier:
             print("\n正在发送剩余消息...")
+            monitor.notifier.stop()
             monitor.notifier.flush()
         print("\n停止监控")
     observer.join()
+    monitor.close()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
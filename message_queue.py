@@ -1,66 +1,179 @@
-import queue
+import heapq
+import itertools
 import threading
 import time
-from typing import Set
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 待发送消息达到该数量时立即发送，不再等待发送间隔
+HIGH_WATER = 50
+# 同一条消息在该时间窗口（秒）内只推送一次
+DEDUP_WINDOW = 900
+# 去重记录最多保留的条数
+MAX_SEEN = 10000
 
 
 class MessageQueue:
     """消息队列管理"""
-    def __init__(self, wechat_api, monitor_name: str):
-        self.queue = queue.Queue()
+    def __init__(self, notifier, monitor_name: str, send_interval: int = 120,
+                 dedup_window: float = DEDUP_WINDOW):
+        self.notifier = notifier
         self.monitor_name = monitor_name
-        self.message_set: Set[str] = set()  # 用于消息去重
-        self._start_send_thread()
+        self.send_interval = send_interval
+        self.dedup_window = dedup_window
+        # 待发送消息，dict既按插入顺序保存又用于去重
+        self._pending: Dict[str, None] = {}
+        # 最近推送过的消息及其时间，按时间先后排列
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._job: Optional[_Job] = None  # 定时发送任务
+        self._last_failure = float('-inf')  # 上次发送失败的时间
     
     def add_message(self, message: str):
         """添加消息到队列"""
-        if message not in self.message_set:
-            self.queue.put(message)
-            self.message_set.add(message)
+        now = time.monotonic()
+        with self._lock:
+            last_seen = self._seen.get(message)
+            if last_seen is not None and now - last_seen < self.dedup_window:
+                return
+            self._seen[message] = now
+            self._seen.move_to_end(message)
+            # 淘汰过期或超出数量上限的去重记录
+            while self._seen:
+                oldest = next(iter(self._seen.values()))
+                if now - oldest < self.dedup_window and len(self._seen) <= MAX_SEEN:
+                    break
+                self._seen.popitem(last=False)
+            self._pending.setdefault(message, None)
+            # 只在积压刚达到阈值时提前发送一次；发送失败后的一个发送间隔内不提前发送，
+            # 避免服务不可用时每来一条消息就重试一次
+            full = (len(self._pending) == HIGH_WATER
+                    and now - self._last_failure >= self.send_interval)
+        if full and self._job is not None:
+            _scheduler.run_soon(self._job)
+    
+    def _requeue(self, messages: List[str]):
+        """将发送失败的消息放回队列"""
+        with self._lock:
+            # 放回队首，保持原有顺序
+            self._pending = {**dict.fromkeys(messages), **self._pending}
+            self._last_failure = time.monotonic()
     
     def _send_messages(self):
         """发送队列中的消息"""
-        messages = []
+        # 整体换出队列中所有消息，锁内只做一次交换
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        messages = list(pending)
+        
         try:
-            # 取出队列中所有消息
-            while not self.queue.empty():
-                messages.append(self.queue.get_nowait())
-                self.queue.task_done()
+            # 发送消息
+            title = f"{self.monitor_name}解码消息[{len(messages)}条]"
+            content = "\n".join(['%d. %s' % item for item in enumerate(messages, 1)])
+            full_message = f"{title}\n{content}"
             
-            if messages:
-                # 清空消息集合
-                self.message_set.clear()
-                
-                # 发送消息
-                title = f"{self.monitor_name}解码消息[{len(messages)}条]"
-                content = "\n".join(str(m) for m in messages)
-                full_message = f"{title}\n{content}"
-                
-                if self.wechat_api:
-                    self.wechat_api.send_message(full_message)
-                    print(f"已发送 {len(messages)} 条消息")
+            if self.notifier.send_message(full_message):
+                print(f"已发送 {len(messages)} 条消息")
+            else:
+                # 发送失败，将消息放回队列
+                self._requeue(messages)
         except Exception as e:
             print(f"发送消息时出错: {e}")
             # 如果发送失败，将消息放回队列
-            for msg in messages:
-                self.queue.put(msg)
-    
-    def _send_thread(self):
-        """消息发送线程"""
-        while True:
-            try:
-                self._send_messages()
-                # 每两分钟执行一次
-                time.sleep(120)
-            except Exception as e:
-                print(f"消息发送线程出错: {e}")
-                time.sleep(120)  # 发生错误时也等待两分钟
+            self._requeue(messages)
     
-    def _start_send_thread(self):
-        """启动消息发送线程"""
-        thread = threading.Thread(target=self._send_thread, daemon=True)
-        thread.start()
+    def start(self):
+        """开始定时发送，由共用的调度线程负责"""
+        self._job = _scheduler.schedule(self.send_interval, self._send_messages)
     
     def flush(self):
         """立即发送所有待发送的消息"""
         self._send_messages()
+    
+    def stop(self):
+        """停止定时发送"""
+        if self._job is not None:
+            _scheduler.cancel(self._job)
+            self._job = None
+
+
+class _Job:
+    """调度线程中的一个定时任务"""
+    def __init__(self, interval: float, func: Callable[[], None]):
+        self.interval = interval
+        self.func = func
+        self.deadline: Optional[float] = None  # 下次执行时间，执行中为None
+        self.cancelled = False
+
+
+class _Scheduler:
+    """所有定时任务共用一个线程，用最小堆按到期时间依次执行"""
+    def __init__(self):
+        # 堆中元素为(执行时间, 序号, 任务)；任务的deadline变化后旧元素作废
+        self._heap: List[Tuple[float, int, _Job]] = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def _push(self, job: _Job, deadline: float):
+        """在持有锁时调用，安排任务在deadline执行"""
+        job.deadline = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), job))
+        self._wake.set()
+    
+    def schedule(self, interval: float, func: Callable[[], None]) -> _Job:
+        """每隔interval秒执行一次func，首次添加任务时启动调度线程"""
+        job = _Job(interval, func)
+        with self._lock:
+            self._push(job, time.monotonic() + interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return job
+    
+    def run_soon(self, job: _Job):
+        """让任务尽快执行一次，之后恢复原有间隔"""
+        with self._lock:
+            if not job.cancelled:
+                self._push(job, time.monotonic())
+    
+    def cancel(self, job: _Job):
+        """取消任务"""
+        with self._lock:
+            job.cancelled = True
+    
+    def _run(self):
+        """调度线程"""
+        while True:
+            job = None
+            timeout = None
+            with self._lock:
+                # 丢弃已取消或已被重新安排的旧元素
+                while self._heap and (self._heap[0][2].cancelled
+                                      or self._heap[0][0] != self._heap[0][2].deadline):
+                    heapq.heappop(self._heap)
+                if self._heap:
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        job = heapq.heappop(self._heap)[2]
+                        job.deadline = None
+                if job is None:
+                    self._wake.clear()
+            if job is None:
+                self._wake.wait(timeout)
+                continue
+            
+            try:
+                job.func()
+            except Exception as e:
+                print(f"定时任务出错: {e}")
+            with self._lock:
+                # 执行期间若已被run_soon重新安排，则保留该安排
+                if not job.cancelled and job.deadline is None:
+                    self._push(job, time.monotonic() + job.interval)
+
+
+_scheduler = _Scheduler()
@@ -2,12 +2,85 @@
 # -*- coding: utf-8 -*-
 
 import abc
-import time
-import queue
+import json
+import select
 import threading
-import requests
+import http.client
 import urllib.parse
-from typing import Optional, Set
+from typing import Dict, Optional, Tuple
+from message_queue import MessageQueue
+
+class _HostConnection:
+    """到同一主机的保持连接，所有通知器共用，避免每次发送都重新建立TCP/TLS连接"""
+    def __init__(self, scheme: str, netloc: str):
+        self.scheme = scheme
+        self.netloc = netloc
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._lock = threading.Lock()
+    
+    def post(self, path: str, body: bytes, headers: Dict[str, str]) -> dict:
+        """发送POST请求并返回JSON结果"""
+        with self._lock:
+            if self._is_stale():
+                self._close()
+            for retry in (False, True):
+                reused = self._conn is not None
+                if not reused:
+                    conn_class = (http.client.HTTPSConnection if self.scheme == 'https'
+                                  else http.client.HTTPConnection)
+                    self._conn = conn_class(self.netloc, timeout=10)
+                try:
+                    self._conn.request('POST', path, body, headers)
+                except (http.client.HTTPException, ConnectionError):
+                    # 请求未能发出，服务器可能已关闭空闲连接，重新连接后再试一次
+                    self._close()
+                    if retry or not reused:
+                        raise
+                    continue
+                except Exception:
+                    self._close()
+                    raise
+                # 请求已发出后出错不再重试，POST不是幂等的，重发可能导致重复推送
+                try:
+                    response = self._conn.getresponse()
+                    result = json.loads(response.read().decode('utf-8'))
+                    if response.will_close:
+                        self._close()
+                    return result
+                except Exception:
+                    self._close()
+                    raise
+    
+    def _is_stale(self) -> bool:
+        """空闲连接上出现可读数据（通常是服务器关闭了连接）时视为已失效"""
+        sock = self._conn.sock if self._conn is not None else None
+        if sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+    
+    def _close(self):
+        """关闭连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_connections: Dict[Tuple[str, str], _HostConnection] = {}
+_connections_lock = threading.Lock()
+
+
+def _get_connection(scheme: str, netloc: str) -> _HostConnection:
+    """获取到指定主机的共用连接"""
+    with _connections_lock:
+        conn = _connections.get((scheme, netloc))
+        if conn is None:
+            conn = _connections[(scheme, netloc)] = _HostConnection(scheme, netloc)
+        return conn
+
 
 class BaseNotifier(abc.ABC):
     """通知器抽象基类"""
@@ -15,85 +88,53 @@ class BaseNotifier(abc.ABC):
     def __init__(self, name: str, send_interval: int = 120, tags: str = ""):
         self.name = name
         self.send_interval = send_interval
-        self.message_queue = queue.Queue()
-        self.message_set: Set[str] = set()  # 用于消息去重
-        self._start_send_thread()
         self.tags = tags
+        self.message_queue = MessageQueue(self, name, send_interval)
     
     @abc.abstractmethod
     def send_message(self, content: str) -> bool:
         """发送消息的具体实现"""
         pass
     
+    def _post_form(self, scheme: str, netloc: str, path: str, data: dict) -> dict:
+        """以表单方式POST并返回JSON结果，复用到同一主机的连接"""
+        body = urllib.parse.urlencode(data).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Connection': 'keep-alive',
+        }
+        return _get_connection(scheme, netloc).post(path, body, headers)
+    
     def add_message(self, message: str):
         """添加消息到队列"""
-        if message not in self.message_set:
-            self.message_queue.put(message)
-            self.message_set.add(message)
+        self.message_queue.add_message(message)
     
-    def _send_messages(self):
-        """发送队列中的消息"""
-        messages = []
-        try:
-            # 取出队列中所有消息
-            while not self.message_queue.empty():
-                messages.append(self.message_queue.get_nowait())
-                self.message_queue.task_done()
-            
-            if messages:
-                # 清空消息集合
-                self.message_set.clear()
-                
-                # 发送消息
-                title = f"{self.name}解码消息[{len(messages)}条]"
-                content = "\n".join(f'{i+1}. {m}' for i, m in enumerate(messages))
-                full_message = f"{title}\n{content}"
-                
-                if self.send_message(full_message):
-                    print(f"已发送 {len(messages)} 条消息")
-                else:
-                    # 发送失败，将消息放回队列
-                    for msg in messages:
-                        self.message_queue.put(msg)
-                    
-        except Exception as e:
-            print(f"发送消息时出错: {e}")
-            # 如果发送失败，将消息放回队列
-            for msg in messages:
-                self.message_queue.put(msg)
-    
-    def _send_thread(self):
-        """消息发送线程"""
-        while True:
-            try:
-                self._send_messages()
-                # 使用配置的发送间隔
-                time.sleep(self.send_interval)
-            except Exception as e:
-                print(f"消息发送线程出错: {e}")
-                time.sleep(self.send_interval)  # 发生错误时也使用配置的间隔
-    
-    def _start_send_thread(self):
-        """启动消息发送线程"""
-        thread = threading.Thread(target=self._send_thread, daemon=True)
-        thread.start()
+    def start(self):
+        """开始后台定时发送，子类应在自身属性全部初始化后调用"""
+        self.message_queue.start()
     
     def flush(self):
         """立即发送所有待发送的消息"""
-        self._send_messages()
+        self.message_queue.flush()
+    
+    def stop(self):
+        """停止后台发送"""
+        self.message_queue.stop()
 
 class ServerChanNotifier(BaseNotifier):
     """Server酱通知实现"""
     
-    def __init__(self, name: str, send_key: str, send_interval: int = 120):
-        super().__init__(name, send_interval)
+    def __init__(self, name: str, send_key: str, send_interval: int = 120, tags: str = ""):
+        super().__init__(name, send_interval, tags)
         self.send_key = send_key
         self.base_url = "https://sctapi.ftqq.com"
+        # 发送地址固定不变，预先拆分出协议、主机和请求路径
+        parts = urllib.parse.urlsplit(f"{self.base_url}/{self.send_key}.send")
+        self._scheme, self._netloc, self._path = parts.scheme, parts.netloc, parts.path
+        self.start()
     
     def send_message(self, content: str) -> bool:
         """发送Server酱消息"""
-        url = f"{self.base_url}/{self.send_key}.send"
-        
         # 将消息拆分为标题和内容
         lines = content.split('\n', 1)
         title = lines[0]
@@ -106,7 +147,7 @@ class ServerChanNotifier(BaseNotifier):
         }
         
         try:
-            response = requests.post(url, data=data).json()
+            response = self._post_form(self._scheme, self._netloc, self._path, data)
             if response.get('code') == 0:
                 return True
             else:
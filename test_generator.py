@@ -7,6 +7,9 @@ import random
 import argparse
 from datetime import datetime, timedelta
 
+# 日志行格式：时间戳 信噪比 时间偏移 频率 ~ 消息状态标记
+_LINE_FMT = "%s  %3d  %+.1f %d ~ %s%s\n"
+
 class TestLogGenerator:
     """测试日志生成器"""
     
@@ -26,30 +29,35 @@ class TestLogGenerator:
             "BP12GOLD", "BG4WOM", "BH4WHQ", "BA1PK", "BG1QMY",
             "VK6KXW", "JA1XYZ", "W1ABC", "EA3XYZ"
         ]
+        self._n_callsigns = len(self.callsigns)
         self.grids = ["OM89", "OL72", "OM98", "PM01", "ON80", "OF87"]
         self.directions = ["EU", "AS", "NA", "SA", "OC", "AF", "DX", "JA"]
         self.snr_range = (-21, 5)
         self.freq_range = (1000, 2500)
+        # dt可以为0或正负一位小数
+        self._dt_choices = (0.0,) + tuple(round(x * 0.1, 1) for x in range(-9, 10) if x != 0)
+        self._replies = ("R-15", "RRR", "73", "RR73")
     
     def _get_last_timestamp(self) -> datetime:
         """获取文件中最后一行的时间戳"""
         try:
-            with open(self.output_file, 'r', encoding='utf-8') as f:
-                # 从文件末尾读取最后1024字节
-                f.seek(0, 2)
+            with open(self.output_file, 'rb') as f:
+                # 从文件末尾读取最后256字节，足够容纳一整行
+                f.seek(0, os.SEEK_END)
                 file_size = f.tell()
-                chunk_size = min(1024, file_size)
-                f.seek(max(0, file_size - chunk_size))
-                lines = f.readlines()
-                
-                if lines:
-                    last_line = lines[-1].strip()
-                    # 尝试解析时间戳
-                    try:
-                        timestamp_str = last_line.split()[0]
-                        return datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                    except (IndexError, ValueError):
-                        pass
+                f.seek(max(0, file_size - 256))
+                tail = f.read()
+            
+            # 只解码最后一行（忽略结尾的换行符）
+            start = tail.rfind(b'\n', 0, len(tail) - 1) + 1
+            last_line = tail[start:].decode('utf-8', 'replace').strip()
+            if last_line:
+                # 尝试解析时间戳
+                try:
+                    timestamp_str = last_line.split()[0]
+                    return datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
+                except (IndexError, ValueError):
+                    pass
         except Exception as e:
             print(f"读取最后时间戳出错: {e}")
         
@@ -71,51 +79,75 @@ class TestLogGenerator:
         # 30%概率生成定向CQ
         if random.random() < 0.3:
             direction = random.choice(self.directions)
-            return f"CQ {direction} {callsign} {grid}"
+            return "CQ %s %s %s" % (direction, callsign, grid)
         
-        return f"CQ {callsign} {grid}"
+        return "CQ %s %s" % (callsign, grid)
     
     def generate_directed_message(self) -> str:
         """生成定向呼叫消息"""
-        caller = random.choice(self.callsigns)
-        called = random.choice(self.callsigns)
-        while caller == called:  # 避免自己呼叫自己
-            called = random.choice(self.callsigns)
+        # 从其余呼号中抽取被叫，避免自己呼叫自己
+        i = random.randrange(self._n_callsigns)
+        j = random.randrange(self._n_callsigns - 1)
+        if j >= i:
+            j += 1
+        caller, called = self.callsigns[i], self.callsigns[j]
             
-        message_types = [
-            f"{called} {caller} {random.choice(self.grids)}",
-            f"{called} {caller} R-15",
-            f"{called} {caller} RRR",
-            f"{called} {caller} 73",
-            f"{called} {caller} RR73"
-        ]
-        return random.choice(message_types)
+        # 先选定消息类型，只格式化选中的那一种：网格或四种固定回复之一
+        kind = random.randrange(1 + len(self._replies))
+        if kind == 0:
+            return "%s %s %s" % (called, caller, random.choice(self.grids))
+        return "%s %s %s" % (called, caller, self._replies[kind - 1])
     
     def generate_line(self) -> str:
         """生成一行日志"""
         timestamp = self.generate_timestamp()
         snr = random.randint(*self.snr_range)
-        # dt可以为0或正负一位小数
-        dt = random.choice([0] + [round(x * 0.1, 1) for x in range(-9, 10) if x != 0])
+        dt = random.choice(self._dt_choices)
         freq = random.randint(0, 3500)
         # 80%概率生成定向呼叫，20%概率生成CQ
         message = self.generate_directed_message() if random.random() < 0.8 else self.generate_cq_message()
         # 状态标记只可能为*、^或空
         status = random.choice(["*", "^", ""]) 
-        return f"{timestamp}  {snr:3d}  {dt:+.1f} {freq} ~ {message}{status}\n"
+        return _LINE_FMT % (timestamp, snr, dt, freq, message, status)
+    
+    def generate_unresolved_message(self) -> str:
+        """生成包含<...>的消息正文"""
+        return f"<...> {random.choice(self.callsigns)} {random.randint(-20, -10)}"
     
     def generate_complex_message(self) -> str:
         """生成复杂消息（包含<...>）"""
         timestamp = self.generate_timestamp()
         snr = random.randint(*self.snr_range)
-        dt = random.choice([0] + [round(x * 0.1, 1) for x in range(-9, 10) if x != 0])
+        dt = random.choice(self._dt_choices)
         freq = random.randint(0, 3500)
-        message = f"<...> {random.choice(self.callsigns)} {random.randint(-20, -10)}"
+        message = self.generate_unresolved_message()
         status = random.choice(["*", "^", ""]) 
-        return f"{timestamp}  {snr:3d}  {dt:+.1f} {freq} ~ {message}{status}\n"
+        return _LINE_FMT % (timestamp, snr, dt, freq, message, status)
+    
+    def generate_batch(self, n: int) -> str:
+        """批量生成n行日志，各字段的随机数一次性抽取"""
+        timestamps = []
+        for step in random.choices(range(1, 6), k=n):
+            timestamps.append(self.current_time.strftime("%Y%m%d_%H%M%S"))
+            self.current_time += timedelta(seconds=step)
+        snrs = random.choices(range(self.snr_range[0], self.snr_range[1] + 1), k=n)
+        dts = random.choices(self._dt_choices, k=n)
+        freqs = random.choices(range(0, 3501), k=n)
+        statuses = random.choices(["*", "^", ""], k=n)
+        # 与run中逐行生成的比例一致：定向呼叫76%，CQ 19%，复杂消息5%
+        makers = random.choices(
+            (self.generate_directed_message, self.generate_cq_message, self.generate_unresolved_message),
+            weights=(76, 19, 5), k=n)
+        return ''.join(
+            _LINE_FMT % (timestamp, snr, dt, freq, make(), status)
+            for timestamp, snr, dt, freq, make, status
+            in zip(timestamps, snrs, dts, freqs, makers, statuses))
     
-    def run(self):
-        """运行生成器"""
+    def run(self, burst: int = 0):
+        """运行生成器
+        
+        burst大于0时为压测模式：每次批量写入burst行，不等待也不逐行打印
+        """
         mode = "追加" if self.append_mode else "覆盖"
         print(f"开始{mode}生成测试日志到文件: {self.output_file}")
         
@@ -125,19 +157,31 @@ class TestLogGenerator:
                 open(self.output_file, 'w').close()
                 print(f"已清空文件: {self.output_file}")
             
-            while True:
-                # 95%概率生成普通消息，5%概率生成复杂消息
-                line = (self.generate_line() if random.random() < 0.95 
-                       else self.generate_complex_message())
+            # 循环中用到的函数先绑定到局部变量
+            rand = random.random
+            uniform = random.uniform
+            sleep = time.sleep
+            # 文件只打开一次。逐行模式用行缓冲，保证每写完一行读取方即可看到；
+            # 压测模式用64KB缓冲按块写入，退出时由with负责把剩余内容写入文件
+            buffering = 64 * 1024 if burst > 0 else 1
+            with open(self.output_file, 'a', encoding='utf-8', buffering=buffering) as f:
+                if burst > 0:
+                    total = 0
+                    while True:
+                        f.write(self.generate_batch(burst))
+                        total += burst
+                        print(f"已生成 {total} 行", end='\r')
                 
-                with open(self.output_file, 'a', encoding='utf-8') as f:
+                while True:
+                    # 95%概率生成普通消息，5%概率生成复杂消息
+                    line = (self.generate_line() if rand() < 0.95 
+                           else self.generate_complex_message())
+                    
                     f.write(line)
-                    f.flush()  # 确保立即写入文件
-                print(line.strip())
-                
-                # 随机等待1-5秒
-                wait_time = random.uniform(1, 5)
-                time.sleep(wait_time)
+                    print(line.strip())
+                    
+                    # 随机等待1-5秒
+                    sleep(uniform(1, 5))
                 
         except KeyboardInterrupt:
             print("\n停止生成测试日志")
@@ -156,6 +200,10 @@ def main():
     parser.add_argument('-n', '--new',
                       action='store_true',
                       help='创建新文件（如果文件存在则清空）')
+    parser.add_argument('-b', '--burst',
+                      type=int,
+                      default=0,
+                      help='压测模式：每次批量生成指定行数，不等待')
     
     args = parser.parse_args()
     
@@ -168,7 +216,7 @@ def main():
     append_mode = not args.new
     
     generator = TestLogGenerator(args.output, append_mode)
-    generator.run()
+    generator.run(args.burst)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file